@@ -1,15 +1,18 @@
 from __future__ import annotations
 
+import base64
 import logging
 import os
-import time
-from typing import Dict, Iterable, List, Mapping, Tuple
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
 
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 from google.genai.types import Content, Part
-from playwright.sync_api import Page, sync_playwright
+from playwright.sync_api import BrowserContext, CDPSession, Page, sync_playwright
 
 # Screen dimensions expected by the Gemini Computer Use tool.
 SCREEN_WIDTH = 1440
@@ -18,13 +21,82 @@ DEFAULT_MODEL = "gemini-2.5-computer-use-preview-10-2025"
 DEFAULT_START_URL = "https://finance.yahoo.com/"
 MAX_TURNS = 5
 MAX_TYPABLE_CHARS = 1024
-PAGE_SETTLE_DELAY_SECONDS = 1.0
+DOM_STABLE_TIMEOUT_MS = 1_500
+# How many recent model/response exchanges to keep in the request context.
+CONTEXT_WINDOW_TURNS = 2
+SCREENSHOT_JPEG_QUALITY = 70
+SCREENSHOT_MIME_TYPE = "image/jpeg"
+SCREENSHOT_CACHE_SIZE = 8
+# The Computer Use tool normalizes coordinates to 0-1000, so pixels beyond
+# ~1000 on the long edge only add upload bytes and model tokens.
+MAX_SCREENSHOT_EDGE = 1024
+_SCREENSHOT_SCALE = min(1.0, MAX_SCREENSHOT_EDGE / max(SCREEN_WIDTH, SCREEN_HEIGHT))
+# Cheap fingerprint of the rendered document, used to key the screenshot cache.
+DOM_FINGERPRINT_SCRIPT = "document.body && document.body.innerHTML.length"
+# Single-evaluate typing path: focuses the element under (x, y), replaces its
+# value, and fires the events a real keystroke sequence would produce. Throws
+# (rather than silently degrading) whenever it cannot reproduce the full
+# requested interaction, so the caller falls back to real keyboard input.
+FAST_TYPE_SCRIPT = """
+([x, y, text, pressEnter]) => {
+    const el = document.elementFromPoint(x, y);
+    if (!el || !('value' in el)) {
+        throw new Error('no editable element at point');
+    }
+    if (pressEnter && !el.form) {
+        // Form-less inputs handle Enter via key listeners; only a real
+        // keyboard press reaches those.
+        throw new Error('no form to submit for press_enter');
+    }
+    el.focus();
+    // Go through the native value setter so frameworks that wrap the
+    // property descriptor (e.g. React) observe the change too.
+    const proto = Object.getPrototypeOf(el);
+    const descriptor = Object.getOwnPropertyDescriptor(proto, 'value');
+    if (descriptor && descriptor.set) {
+        descriptor.set.call(el, text);
+    } else {
+        el.value = text;
+    }
+    el.dispatchEvent(new Event('input', { bubbles: true }));
+    el.dispatchEvent(new Event('change', { bubbles: true }));
+    if (pressEnter) {
+        el.form.requestSubmit();
+    }
+}
+"""
+# Stability probe replacing the fixed settle delay: returns as soon as the
+# document is fully loaded and nothing is marked busy.
+DOM_STABLE_SCRIPT = (
+    "() => document.readyState === 'complete'"
+    " && !document.querySelector('[aria-busy=\"true\"]')"
+)
 LOAD_STATE_TIMEOUT_MS = 5_000
 NAVIGATION_TIMEOUT_MS = 30_000
 SAFE_ACTIONS = frozenset({"open_web_browser", "click_at", "type_text_at"})
 
 LOGGER = logging.getLogger(__name__)
 
+# Immutable request configuration; pydantic construction is not free, so build
+# it once per process instead of per run.
+GENERATE_CONTENT_CONFIG = types.GenerateContentConfig(
+    tools=[
+        types.Tool(
+            computer_use=types.ComputerUse(
+                environment=types.Environment.ENVIRONMENT_BROWSER
+            )
+        )
+    ]
+)
+
+# Translate table deleting control characters (C0 except \t\n\r, DEL, C1) in a
+# single C-level pass instead of per-character Python dispatch.
+_SANITIZE_TABLE = dict.fromkeys(
+    cp
+    for cp in (*range(0x00, 0x20), 0x7F, *range(0x80, 0xA0))
+    if chr(cp) not in ("\n", "\r", "\t")
+)
+
 
 def configure_logging() -> None:
     """Configure a basic logger once per process."""
@@ -47,45 +119,196 @@ def create_client() -> genai.Client:
     return genai.Client(api_key=api_key)
 
 
+@lru_cache(maxsize=4096)
 def denormalize_coordinate(value: float, dimension: int) -> int:
-    """Convert the normalized coordinate (0-1000) into a screen pixel location."""
-    clamped = max(0.0, min(1000.0, float(value)))
-    return int(clamped / 1000.0 * dimension)
+    """Convert the normalized coordinate (0-1000) into a screen pixel location.
+
+    Cached: the dimension is fixed per session and UI anchor coordinates
+    repeat across turns, so most calls are cache hits.
+    """
+    v = 0 if value < 0 else 1000 if value > 1000 else value
+    return int(v * dimension) // 1000
 
 
 def sanitize_text(text: object) -> str:
     """Limit generated text length and strip non-printable characters."""
-    raw = str(text) if text is not None else ""
-    printable_chars = (char for char in raw if char.isprintable() or char in ("\n", "\r", "\t"))
-    return "".join(printable_chars)[:MAX_TYPABLE_CHARS]
+    # Truncate first so every scan below is bounded by MAX_TYPABLE_CHARS.
+    raw = (str(text) if text is not None else "")[:MAX_TYPABLE_CHARS]
+    # Most model output is clean ASCII; detect the nothing-to-strip case with
+    # C-level scans and skip the translate pass entirely.
+    if raw.isascii():
+        if raw.isprintable():
+            return raw
+        # Fold allowed whitespace onto spaces; if the result is printable,
+        # the original held no control characters worth stripping.
+        folded = raw.replace("\t", " ").replace("\n", " ").replace("\r", " ")
+        if folded.isprintable():
+            return raw
+    return raw.translate(_SANITIZE_TABLE)
+
+
+def capture_screenshot(page: Page, cdp: Optional[CDPSession] = None) -> bytes:
+    """
+    Capture the current viewport as JPEG bytes.
+
+    JPEG encodes faster than PNG and produces smaller payloads for the Gemini
+    upload. When a CDP session is available (Chromium), use
+    ``Page.captureScreenshot`` with ``optimizeForSpeed`` to skip the slow
+    encoder path, downscaling in-capture so the long edge stays within
+    ``MAX_SCREENSHOT_EDGE``; otherwise fall back to Playwright's screenshot
+    API at full resolution.
+    """
+    if cdp is not None:
+        try:
+            # fromSurface=false grabs the compositor's last frame without
+            # waiting for a fresh one, but only renders reliably while the
+            # page is foregrounded (background tabs are throttled).
+            try:
+                page.bring_to_front()
+            except Exception as exc:
+                LOGGER.debug("Could not bring page to front: %s", exc)
+            params: Dict[str, object] = {
+                "format": "jpeg",
+                "quality": SCREENSHOT_JPEG_QUALITY,
+                "optimizeForSpeed": True,
+                "captureBeyondViewport": False,
+                "fromSurface": False,
+            }
+            if _SCREENSHOT_SCALE < 1.0:
+                params["clip"] = {
+                    "x": 0,
+                    "y": 0,
+                    "width": SCREEN_WIDTH,
+                    "height": SCREEN_HEIGHT,
+                    "scale": _SCREENSHOT_SCALE,
+                }
+            try:
+                payload = cdp.send("Page.captureScreenshot", params)
+            except Exception as exc:
+                # Headless Chromium has no view surface, so fromSurface=false
+                # is rejected there; retry once with the default capture
+                # before abandoning the CDP path.
+                LOGGER.debug(
+                    "Compositor-frame capture failed (%s); retrying fromSurface.",
+                    exc,
+                )
+                del params["fromSurface"]
+                payload = cdp.send("Page.captureScreenshot", params)
+            return base64.b64decode(payload["data"])
+        except Exception as exc:
+            LOGGER.debug("CDP screenshot failed; using Playwright fallback: %s", exc)
+    return page.screenshot(type="jpeg", quality=SCREENSHOT_JPEG_QUALITY)
+
+
+# Encoded screenshots keyed by (url, DOM fingerprint), evicted oldest-first.
+_screenshot_cache: "OrderedDict[Tuple[str, object], bytes]" = OrderedDict()
+
+
+def cached_screenshot(page: Page, cdp: Optional[CDPSession] = None) -> bytes:
+    """
+    Capture a screenshot, reusing cached bytes when the page has not changed.
+
+    The raster + encode round-trip through Chromium is the largest per-turn
+    cost; turns that leave the page untouched (no-op actions, unsupported
+    functions) can reuse the previous encoding. The cache key is a cheap
+    heuristic fingerprint of URL plus rendered DOM size, which is blind to
+    property-only changes (a typed value never shows up in ``innerHTML``), so
+    ``execute_calls`` clears the cache after any batch that touches the page.
+    """
+    try:
+        key = (getattr(page, "url", ""), page.evaluate(DOM_FINGERPRINT_SCRIPT))
+    except Exception as exc:
+        LOGGER.debug("Could not fingerprint page for screenshot cache: %s", exc)
+        key = None
+    if key is not None and key in _screenshot_cache:
+        _screenshot_cache.move_to_end(key)
+        return _screenshot_cache[key]
+
+    screenshot_bytes = capture_screenshot(page, cdp)
+    if key is not None:
+        _screenshot_cache[key] = screenshot_bytes
+        while len(_screenshot_cache) > SCREENSHOT_CACHE_SIZE:
+            _screenshot_cache.popitem(last=False)
+    return screenshot_bytes
+
+
+def fast_type_at(page: Page, x: int, y: int, text: str, press_enter: bool) -> None:
+    """
+    Type into the element at (x, y) with a single protocol round-trip.
+
+    The click/select-all/backspace/type sequence costs four to five CDP
+    websocket round-trips; one ``page.evaluate`` collapses them into one.
+    Raises when the target is not an editable element so the caller can fall
+    back to the keyboard path.
+    """
+    page.evaluate(FAST_TYPE_SCRIPT, [x, y, text, press_enter])
+
+
+def cdp_click(cdp: CDPSession, x: int, y: int) -> None:
+    """
+    Dispatch a left click directly on the CDP session.
+
+    Skips Playwright's action pipeline (target resolution, actionability
+    checks, parameter marshalling) for the trusting click-at-pixel case.
+    """
+    for event_type in ("mousePressed", "mouseReleased"):
+        cdp.send(
+            "Input.dispatchMouseEvent",
+            {
+                "type": event_type,
+                "x": x,
+                "y": y,
+                "button": "left",
+                "clickCount": 1,
+            },
+        )
+
+
+def wait_for_dom_stable(page: Page, timeout_ms: int = DOM_STABLE_TIMEOUT_MS) -> None:
+    """
+    Wait briefly for the document to look stable, returning early when it does.
+
+    Fast pages continue immediately instead of eating a fixed settle delay;
+    slow pages are still bounded by the timeout, which is swallowed.
+    """
+    try:
+        page.wait_for_function(DOM_STABLE_SCRIPT, timeout=timeout_ms)
+    except Exception as exc:
+        LOGGER.debug("Page did not stabilize within %sms: %s", timeout_ms, exc)
 
 
 def collect_function_calls(candidate: types.Candidate) -> List[types.FunctionCall]:
     """Extract function calls from the model candidate, if any."""
-    calls: List[types.FunctionCall] = []
     content = getattr(candidate, "content", None)
     if not content:
-        return calls
-    for part in getattr(content, "parts", []) or []:
-        function_call = getattr(part, "function_call", None)
-        if function_call:
-            calls.append(function_call)
-    return calls
+        return []
+    parts = getattr(content, "parts", None) or ()
+    return [
+        part.function_call
+        for part in parts
+        if getattr(part, "function_call", None) is not None
+    ]
 
 
-def execute_function_calls(
-    candidate: types.Candidate,
+def execute_calls(
+    calls: Iterable[types.FunctionCall],
     page: Page,
     screen_width: int,
     screen_height: int,
+    cdp: Optional[CDPSession] = None,
 ) -> List[Tuple[str, Dict[str, str]]]:
     """
-    Execute tool calls suggested by the model while validating inputs.
+    Execute pre-collected tool calls while validating inputs.
+
+    The page is given a single chance to settle after the whole batch rather
+    than after every action, so a turn with several calls pays the load-state
+    wait and settle delay once.
 
     Returns a list containing the function name along with execution metadata.
     """
     results: List[Tuple[str, Dict[str, str]]] = []
-    for function_call in collect_function_calls(candidate):
+    needs_settle = False
+    for function_call in calls:
         fname = getattr(function_call, "name", "")
         args: Mapping[str, object] = getattr(function_call, "args", {}) or {}
         LOGGER.info("Executing tool action: %s", fname)
@@ -98,39 +321,78 @@ def execute_function_calls(
         action_result: Dict[str, str] = {"status": "ok"}
         try:
             if fname == "open_web_browser":
-                # Browser is already running; nothing to do.
+                # Browser is already running; nothing to do, so the page
+                # cannot have changed and needs no settle wait.
                 LOGGER.debug("Browser already active; no operation required.")
             elif fname == "click_at":
                 x = denormalize_coordinate(args.get("x", 0), screen_width)
                 y = denormalize_coordinate(args.get("y", 0), screen_height)
-                page.mouse.click(x, y)
+                if cdp is not None:
+                    cdp_click(cdp, x, y)
+                else:
+                    page.mouse.click(x, y)
             elif fname == "type_text_at":
                 x = denormalize_coordinate(args.get("x", 0), screen_width)
                 y = denormalize_coordinate(args.get("y", 0), screen_height)
                 text = sanitize_text(args.get("text", ""))
                 press_enter = bool(args.get("press_enter", False))
 
-                page.mouse.click(x, y)
-                page.keyboard.press("Meta+A")
-                page.keyboard.press("Backspace")
-                page.keyboard.type(text)
-                if press_enter:
-                    page.keyboard.press("Enter")
-
-            page.wait_for_load_state(timeout=LOAD_STATE_TIMEOUT_MS)
-            time.sleep(PAGE_SETTLE_DELAY_SECONDS)
+                try:
+                    fast_type_at(page, x, y, text, press_enter)
+                except Exception as exc:
+                    LOGGER.debug(
+                        "Fast typing path failed (%s); using keyboard fallback.", exc
+                    )
+                    if cdp is not None:
+                        cdp_click(cdp, x, y)
+                    else:
+                        page.mouse.click(x, y)
+                    page.keyboard.press("Meta+A")
+                    page.keyboard.press("Backspace")
+                    page.keyboard.type(text)
+                    if press_enter:
+                        page.keyboard.press("Enter")
+
+            if fname != "open_web_browser":
+                needs_settle = True
         except Exception as exc:  # Broad catch to keep the loop resilient.
             LOGGER.exception("Error executing %s: %s", fname, exc)
             action_result = {"error": str(exc)}
 
         results.append((fname, action_result))
 
+    if needs_settle:
+        # The fingerprint cannot see property-only mutations (e.g. a typed
+        # value), so a batch that touched the page must not serve stale bytes.
+        _screenshot_cache.clear()
+        try:
+            page.wait_for_load_state(timeout=LOAD_STATE_TIMEOUT_MS)
+        except Exception as exc:
+            LOGGER.warning("Timed out waiting for page to load: %s", exc)
+        # load fires immediately for JS-driven rendering; gate the upcoming
+        # screenshot on the aria-busy probe as well.
+        wait_for_dom_stable(page)
+
     return results
 
 
+def execute_function_calls(
+    candidate: types.Candidate,
+    page: Page,
+    screen_width: int,
+    screen_height: int,
+    cdp: Optional[CDPSession] = None,
+) -> List[Tuple[str, Dict[str, str]]]:
+    """Execute tool calls suggested by the model while validating inputs."""
+    return execute_calls(
+        collect_function_calls(candidate), page, screen_width, screen_height, cdp
+    )
+
+
 def get_function_responses(
     page: Page,
     results: Iterable[Tuple[str, Dict[str, str]]],
+    cdp: Optional[CDPSession] = None,
 ) -> List[types.FunctionResponse]:
     """
     Capture the current page state for the tool responses.
@@ -138,53 +400,225 @@ def get_function_responses(
     The screenshot gives the model visual context for the next turn.
     """
     try:
-        screenshot_bytes = page.screenshot(type="png")
+        screenshot_bytes = cached_screenshot(page, cdp)
     except Exception as exc:
         LOGGER.warning("Unable to capture screenshot: %s", exc)
         screenshot_bytes = b""
     current_url = getattr(page, "url", "")
 
+    # One image of world state per turn: attaching the same blob to every
+    # response would re-upload identical bytes N times.
+    screenshot_parts = [
+        types.FunctionResponsePart(
+            inline_data=types.FunctionResponseBlob(
+                mime_type=SCREENSHOT_MIME_TYPE,
+                data=screenshot_bytes,
+            )
+        )
+    ]
+
     function_responses: List[types.FunctionResponse] = []
     for name, result in results:
-        response_payload = {"url": current_url}
-        response_payload.update(result)
         function_responses.append(
             types.FunctionResponse(
                 name=name,
-                response=response_payload,
-                parts=[
-                    types.FunctionResponsePart(
-                        inline_data=types.FunctionResponseBlob(
-                            mime_type="image/png",
-                            data=screenshot_bytes,
-                        )
-                    )
-                ],
+                response={"url": current_url, **result},
+                parts=screenshot_parts if not function_responses else [],
             )
         )
     return function_responses
 
 
+def trim_contents(contents: List[Content]) -> List[Content]:
+    """
+    Cap the conversation to the initial prompt plus the most recent turns.
+
+    Every turn appends the model content and a user content carrying a
+    screenshot, so turn N would otherwise re-upload N-1 turns of images to
+    Gemini. Keeping the task prompt plus the last ``CONTEXT_WINDOW_TURNS``
+    exchanges makes the bytes uploaded per turn O(1). Exchanges are appended
+    in (model, user) pairs, so the window always starts on a model content.
+    """
+    keep = 2 * CONTEXT_WINDOW_TURNS
+    if len(contents) <= 1 + keep:
+        return contents
+    return contents[:1] + contents[-keep:]
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
 def extract_text_response(parts: Iterable[Part]) -> str:
-    """Collect plain-text responses from the model output."""
-    snippets = [part.text.strip() for part in parts if getattr(part, "text", "").strip()]
-    return " ".join(snippets)
+    """Collect plain-text responses from the model output, single-spaced."""
+    joined = " ".join(getattr(part, "text", "") or "" for part in parts)
+    return _WHITESPACE_RE.sub(" ", joined).strip()
+
+
+def _run_turns(
+    client: genai.Client,
+    page: Page,
+    cdp: Optional[CDPSession],
+    contents: List[Content],
+) -> None:
+    """Drive the think/act/observe loop until the model finishes or turns run out."""
+    for turn in range(1, MAX_TURNS + 1):
+        LOGGER.info("--- Turn %s ---", turn)
+        try:
+            response = client.models.generate_content(
+                model=DEFAULT_MODEL,
+                contents=contents,
+                config=GENERATE_CONTENT_CONFIG,
+            )
+        except Exception as exc:
+            LOGGER.exception("Model request failed: %s", exc)
+            break
+
+        if not response.candidates:
+            LOGGER.warning("Model returned no candidates; stopping.")
+            break
+
+        candidate = response.candidates[0]
+        contents.append(candidate.content)
+
+        calls = collect_function_calls(candidate)
+        if not calls:
+            text_response = extract_text_response(
+                getattr(candidate.content, "parts", []) or []
+            )
+            LOGGER.info("Agent finished: %s", text_response)
+            break
+
+        results = execute_calls(calls, page, SCREEN_WIDTH, SCREEN_HEIGHT, cdp)
+        function_responses = get_function_responses(page, results, cdp)
+        contents.append(
+            Content(
+                role="user",
+                parts=[Part(function_response=fr) for fr in function_responses],
+            )
+        )
+        contents = trim_contents(contents)
+    else:
+        LOGGER.info("Reached maximum number of turns (%s).", MAX_TURNS)
+
+
+def _run_in_context(
+    client: genai.Client,
+    context: BrowserContext,
+    user_prompt: str,
+) -> None:
+    """Run one agent session on a page opened in the given browser context."""
+    page = context.new_page()
+    try:
+        try:
+            cdp: Optional[CDPSession] = context.new_cdp_session(page)
+        except Exception as exc:
+            LOGGER.warning("CDP session unavailable: %s", exc)
+            cdp = None
+        LOGGER.info("Navigating to %s", DEFAULT_START_URL)
+        page.goto(
+            DEFAULT_START_URL,
+            wait_until="domcontentloaded",
+            timeout=NAVIGATION_TIMEOUT_MS,
+        )
+
+        initial_screenshot = cached_screenshot(page, cdp)
+        contents: List[Content] = [
+            Content(
+                role="user",
+                parts=[
+                    Part(text=user_prompt),
+                    Part.from_bytes(
+                        data=initial_screenshot,
+                        mime_type=SCREENSHOT_MIME_TYPE,
+                    ),
+                ],
+            )
+        ]
+
+        _run_turns(client, page, cdp, contents)
+    finally:
+        page.close()
+
+
+class BrowserPool:
+    """
+    Reuse one Playwright browser and its contexts across agent runs.
 
+    Launching Chromium costs seconds; callers that run several prompts in one
+    process can hold a pool, pass it to ``run_agent``, and pay the launch
+    once. Released contexts have their cookies cleared and are handed back
+    out on the next acquire. ``close()`` tears everything down.
+    """
+
+    MAX_IDLE_CONTEXTS = 2
 
-def run_agent(user_prompt: str, *, headless: bool = False) -> None:
+    def __init__(self, *, headless: bool = False) -> None:
+        self._headless = headless
+        self._playwright = None
+        self._browser = None
+        self._contexts: List[BrowserContext] = []
+
+    def acquire(self) -> BrowserContext:
+        """Return a browser context, launching the browser on first use."""
+        if self._browser is None:
+            LOGGER.info(
+                "Starting Playwright and launching pooled browser (headless=%s)...",
+                self._headless,
+            )
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch(headless=self._headless)
+        if self._contexts:
+            return self._contexts.pop()
+        return self._browser.new_context(
+            viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT}
+        )
+
+    def release(self, context: BrowserContext) -> None:
+        """Return a context to the pool, clearing its session state."""
+        try:
+            context.clear_cookies()
+        except Exception as exc:
+            LOGGER.warning("Could not reset context; closing it instead: %s", exc)
+            context.close()
+            return
+        if len(self._contexts) < self.MAX_IDLE_CONTEXTS:
+            self._contexts.append(context)
+        else:
+            context.close()
+
+    def close(self) -> None:
+        """Close pooled contexts and shut the browser down."""
+        for context in self._contexts:
+            try:
+                context.close()
+            except Exception as exc:
+                LOGGER.warning("Error closing pooled context: %s", exc)
+        self._contexts.clear()
+        if self._browser is not None:
+            self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+
+
+def run_agent(
+    user_prompt: str,
+    *,
+    headless: bool = False,
+    pool: Optional[BrowserPool] = None,
+) -> None:
     """Run the Gemini Computer Use agent end-to-end."""
     configure_logging()
     client = create_client()
 
-    config = types.GenerateContentConfig(
-        tools=[
-            types.Tool(
-                computer_use=types.ComputerUse(
-                    environment=types.Environment.ENVIRONMENT_BROWSER
-                )
-            )
-        ]
-    )
+    if pool is not None:
+        context = pool.acquire()
+        try:
+            _run_in_context(client, context, user_prompt)
+        finally:
+            pool.release(context)
+        return
 
     LOGGER.info("Starting Playwright and launching browser (headless=%s)...", headless)
     with sync_playwright() as playwright:
@@ -193,70 +627,7 @@ def run_agent(user_prompt: str, *, headless: bool = False) -> None:
             with browser.new_context(
                 viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT}
             ) as context:
-                page = context.new_page()
-                LOGGER.info("Navigating to %s", DEFAULT_START_URL)
-                page.goto(
-                    DEFAULT_START_URL,
-                    wait_until="domcontentloaded",
-                    timeout=NAVIGATION_TIMEOUT_MS,
-                )
-
-                initial_screenshot = page.screenshot(type="png")
-                contents: List[Content] = [
-                    Content(
-                        role="user",
-                        parts=[
-                            Part(text=user_prompt),
-                            Part.from_bytes(data=initial_screenshot, mime_type="image/png"),
-                        ],
-                    )
-                ]
-
-                for turn in range(1, MAX_TURNS + 1):
-                    LOGGER.info("--- Turn %s ---", turn)
-                    try:
-                        response = client.models.generate_content(
-                            model=DEFAULT_MODEL,
-                            contents=contents,
-                            config=config,
-                        )
-                    except Exception as exc:
-                        LOGGER.exception("Model request failed: %s", exc)
-                        break
-
-                    if not response.candidates:
-                        LOGGER.warning("Model returned no candidates; stopping.")
-                        break
-
-                    candidate = response.candidates[0]
-                    contents.append(candidate.content)
-
-                    has_function_calls = any(
-                        getattr(part, "function_call", None)
-                        for part in getattr(candidate.content, "parts", []) or []
-                    )
-                    if not has_function_calls:
-                        text_response = extract_text_response(
-                            getattr(candidate.content, "parts", []) or []
-                        )
-                        LOGGER.info("Agent finished: %s", text_response)
-                        break
-
-                    results = execute_function_calls(
-                        candidate,
-                        page,
-                        SCREEN_WIDTH,
-                        SCREEN_HEIGHT,
-                    )
-                    function_responses = get_function_responses(page, results)
-                    contents.append(
-                        Content(
-                            role="user",
-                            parts=[Part(function_response=fr) for fr in function_responses],
-                        )
-                    )
-                else:
-                    LOGGER.info("Reached maximum number of turns (%s).", MAX_TURNS)
+                _run_in_context(client, context, user_prompt)
         finally:
             LOGGER.info("Closing browser.")
             browser.close()
@@ -1,6 +1,9 @@
 """Pytest configuration and shared fixtures."""
+import functools
+from types import SimpleNamespace
+
 import pytest
-from unittest.mock import Mock
+from unittest.mock import MagicMock, Mock
 
 
 @pytest.fixture
@@ -9,12 +12,94 @@ def mock_page():
     page = Mock()
     page.url = "https://example.com"
     page.screenshot.return_value = b"fake_screenshot"
-    page.mouse = Mock()
-    page.keyboard = Mock()
-    page.wait_for_load_state = Mock()
+    return page
+
+
+@functools.lru_cache(maxsize=64)
+def _make_candidate(function_name, args_items):
+    """Build a plain-data candidate carrying a single function call.
+
+    SimpleNamespace avoids Mock(spec=...) introspection for objects that are
+    only ever read, never asserted on. Memoized on (name, args) so repeated
+    and parametrized tests share one read-only tree per distinct call.
+    """
+    function_call = SimpleNamespace(name=function_name, args=dict(args_items))
+    part = SimpleNamespace(function_call=function_call, text=None)
+    return SimpleNamespace(content=SimpleNamespace(parts=[part]))
+
+
+def make_candidate(function_name, args):
+    """Return a (possibly cached) candidate for the given call name and args."""
+    return _make_candidate(function_name, tuple(sorted(args.items())))
+
+
+@pytest.fixture
+def candidate_factory():
+    """Build candidates carrying a single function call, shared across tests."""
+    return make_candidate
+
+
+@pytest.fixture
+def mock_playwright_stack():
+    """A wired Playwright mock chain: playwright -> browser -> context -> page."""
+    page = Mock()
+    page.url = "https://example.com"
+    page.screenshot.return_value = b"fake_screenshot"
+
+    context = MagicMock()
+    context.new_page.return_value = page
+    context.__enter__.return_value = context
+
+    browser = Mock()
+    browser.new_context.return_value = context
+
+    playwright = MagicMock()
+    playwright.chromium.launch.return_value = browser
+    playwright.__enter__.return_value = playwright
+
+    return SimpleNamespace(
+        page=page, context=context, browser=browser, playwright=playwright
+    )
+
+
+@pytest.fixture
+def agent_mocks(monkeypatch, mock_playwright_stack):
+    """Patch the agent's external seams in one place: Playwright, client, logging.
+
+    A single monkeypatch pass replaces the triple @patch decorator stack the
+    integration tests used to carry.
+    """
+    create_client = Mock()
+    configure_logging = Mock()
+    monkeypatch.setattr(
+        "computer_use_agent.sync_playwright",
+        Mock(return_value=mock_playwright_stack.playwright),
+    )
+    monkeypatch.setattr("computer_use_agent.create_client", create_client)
+    monkeypatch.setattr("computer_use_agent.configure_logging", configure_logging)
+    return SimpleNamespace(
+        stack=mock_playwright_stack,
+        client=create_client.return_value,
+        create_client=create_client,
+        configure_logging=configure_logging,
+    )
+
+
+@pytest.fixture
+def ok_page():
+    """A page mock that captures screenshots and reports a stable URL."""
+    page = Mock()
+    page.screenshot.return_value = b"fake_screenshot"
+    page.url = "https://example.com"
     return page
 
 
+@pytest.fixture
+def ok_results():
+    """A single successful click_at result row."""
+    return [("click_at", {"status": "ok"})]
+
+
 @pytest.fixture
 def mock_browser():
     """Create a mock Playwright browser object."""
@@ -33,43 +118,18 @@ def mock_genai_client():
 @pytest.fixture
 def sample_function_call():
     """Create a sample function call for testing."""
-    from unittest.mock import Mock
-    from google.genai.types import FunctionCall
-
-    function_call = Mock(spec=FunctionCall)
-    function_call.name = "click_at"
-    function_call.args = {"x": 500, "y": 500}
-    return function_call
+    return SimpleNamespace(name="click_at", args={"x": 500, "y": 500})
 
 
 @pytest.fixture
 def sample_candidate_with_text():
     """Create a sample candidate with text response."""
-    from unittest.mock import Mock
-    from google.genai.types import Candidate, Part
-
-    part = Mock(spec=Part)
-    part.text = "Sample response"
-    part.function_call = None
-
-    candidate = Mock(spec=Candidate)
-    candidate.content = Mock()
-    candidate.content.parts = [part]
-
-    return candidate
+    part = SimpleNamespace(text="Sample response", function_call=None)
+    return SimpleNamespace(content=SimpleNamespace(parts=[part]))
 
 
 @pytest.fixture
 def sample_candidate_with_function_call(sample_function_call):
     """Create a sample candidate with function call."""
-    from unittest.mock import Mock
-    from google.genai.types import Candidate
-
-    part = Mock()
-    part.function_call = sample_function_call
-
-    candidate = Mock(spec=Candidate)
-    candidate.content = Mock()
-    candidate.content.parts = [part]
-
-    return candidate
+    part = SimpleNamespace(function_call=sample_function_call, text=None)
+    return SimpleNamespace(content=SimpleNamespace(parts=[part]))
@@ -0,0 +1,26 @@
+"""Throughput regression guards for hot text-processing helpers."""
+import pytest
+
+from computer_use_agent import sanitize_text, MAX_TYPABLE_CHARS
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("size", [MAX_TYPABLE_CHARS, 1048576], ids=["at-cap", "1MB"])
+def test_sanitize_text_bench(benchmark, size):
+    """Guard sanitize_text's per-call cost at and far beyond the typing cap.
+
+    Work is bounded by MAX_TYPABLE_CHARS, so the two sizes should cost the
+    same: the at-cap case catches a quadratic rewrite inside the kept
+    prefix, and the 1 MB case catches a regression of the truncate-before-
+    scan ordering (scanning first makes it ~1000x slower). The payload
+    mixes printable text with control bytes so the translate path is
+    exercised rather than the clean-input fast path.
+    """
+    payload = ("Hello\x00World\x01 " * (size // 14 + 1))[:size]
+    benchmark.extra_info["bytes"] = size
+
+    result = benchmark(sanitize_text, payload)
+
+    assert len(result) <= MAX_TYPABLE_CHARS
+    assert "\x00" not in result
+    assert "\x01" not in result
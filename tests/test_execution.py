@@ -1,34 +1,28 @@
 """Unit tests for function execution logic."""
+from types import SimpleNamespace
+
 import pytest
-from unittest.mock import Mock, MagicMock, patch
-from computer_use_agent import execute_function_calls, SCREEN_WIDTH, SCREEN_HEIGHT
-from google.genai.types import Candidate, FunctionCall
+from unittest.mock import Mock
+import computer_use_agent
+from computer_use_agent import (
+    execute_function_calls,
+    wait_for_dom_stable,
+    DOM_STABLE_SCRIPT,
+    FAST_TYPE_SCRIPT,
+    LOAD_STATE_TIMEOUT_MS,
+    SCREEN_WIDTH,
+    SCREEN_HEIGHT,
+)
 
 
 class TestExecuteFunctionCalls:
     """Tests for execute_function_calls function."""
 
-    def setup_method(self):
-        """Set up test fixtures."""
-        self.page = Mock()
-        self.page.mouse = Mock()
-        self.page.keyboard = Mock()
-        self.page.wait_for_load_state = Mock()
-
-    def create_candidate_with_call(self, function_name, args):
-        """Helper to create a candidate with a function call."""
-        function_call = Mock(spec=FunctionCall)
-        function_call.name = function_name
-        function_call.args = args
-
-        part = Mock()
-        part.function_call = function_call
-
-        candidate = Mock(spec=Candidate)
-        candidate.content = Mock()
-        candidate.content.parts = [part]
-
-        return candidate
+    @pytest.fixture(autouse=True)
+    def _setup(self, mock_page, candidate_factory):
+        """Wire the shared page mock and candidate builder into each test."""
+        self.page = mock_page
+        self.create_candidate_with_call = candidate_factory
 
     def test_open_web_browser(self):
         """Test open_web_browser action (no-op)."""
@@ -41,12 +35,24 @@ class TestExecuteFunctionCalls:
         assert len(results) == 1
         assert results[0][0] == "open_web_browser"
         assert results[0][1] == {"status": "ok"}
-        # Should not interact with page
+        # Should not interact with page, and a no-op needs no settle wait
         self.page.mouse.click.assert_not_called()
-
-    def test_click_at_basic(self):
-        """Test basic click_at action."""
-        candidate = self.create_candidate_with_call("click_at", {"x": 500, "y": 500})
+        self.page.wait_for_load_state.assert_not_called()
+        self.page.wait_for_function.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "args,expected",
+        [
+            ({"x": 500, "y": 500}, (720, 450)),  # 500/1000 of 1440x900
+            ({"x": 0, "y": 0}, (0, 0)),
+            ({"x": 1000, "y": 1000}, (SCREEN_WIDTH, SCREEN_HEIGHT)),
+            ({}, (0, 0)),  # missing coordinates default to 0
+        ],
+        ids=["midpoint", "origin", "max", "missing"],
+    )
+    def test_click_at_coordinates(self, args, expected):
+        """Test click_at denormalization across the coordinate corners."""
+        candidate = self.create_candidate_with_call("click_at", args)
 
         results = execute_function_calls(
             candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT
@@ -55,48 +61,34 @@ class TestExecuteFunctionCalls:
         assert len(results) == 1
         assert results[0][0] == "click_at"
         assert results[0][1] == {"status": "ok"}
-        # 500/1000 * 1440 = 720, 500/1000 * 900 = 450
-        self.page.mouse.click.assert_called_once_with(720, 450)
-        self.page.wait_for_load_state.assert_called_once()
-
-    def test_click_at_zero_coordinates(self):
-        """Test click_at at origin (0,0)."""
-        candidate = self.create_candidate_with_call("click_at", {"x": 0, "y": 0})
-
-        results = execute_function_calls(
-            candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT
-        )
-
-        assert results[0][1] == {"status": "ok"}
-        self.page.mouse.click.assert_called_once_with(0, 0)
-
-    def test_click_at_max_coordinates(self):
-        """Test click_at at maximum coordinates."""
-        candidate = self.create_candidate_with_call("click_at", {"x": 1000, "y": 1000})
-
-        results = execute_function_calls(
-            candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT
-        )
-
-        assert results[0][1] == {"status": "ok"}
-        self.page.mouse.click.assert_called_once_with(SCREEN_WIDTH, SCREEN_HEIGHT)
-
-    def test_click_at_missing_coordinates(self):
-        """Test click_at with missing coordinates defaults to 0."""
-        candidate = self.create_candidate_with_call("click_at", {})
-
-        results = execute_function_calls(
-            candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT
-        )
-
-        assert results[0][1] == {"status": "ok"}
-        self.page.mouse.click.assert_called_once_with(0, 0)
-
-    def test_type_text_at_basic(self):
-        """Test basic type_text_at action."""
-        candidate = self.create_candidate_with_call(
-            "type_text_at", {"x": 500, "y": 500, "text": "Hello World"}
-        )
+        self.page.mouse.click.assert_called_once_with(*expected)
+
+    @pytest.mark.parametrize(
+        "args,expected",
+        [
+            (
+                {"x": 500, "y": 500, "text": "Hello World"},
+                [720, 450, "Hello World", False],
+            ),
+            (
+                {"x": 500, "y": 500, "text": "Search query", "press_enter": True},
+                [720, 450, "Search query", True],
+            ),
+            (
+                {"x": 500, "y": 500, "text": "Test", "press_enter": False},
+                [720, 450, "Test", False],
+            ),
+            (
+                # Non-printable characters should be removed
+                {"x": 500, "y": 500, "text": "Hello\x00World\x01"},
+                [720, 450, "HelloWorld", False],
+            ),
+        ],
+        ids=["basic", "with-enter", "without-enter", "sanitized"],
+    )
+    def test_type_text_at(self, args, expected):
+        """Test type_text_at argument handling on the single-evaluate path."""
+        candidate = self.create_candidate_with_call("type_text_at", args)
 
         results = execute_function_calls(
             candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT
@@ -106,16 +98,16 @@ class TestExecuteFunctionCalls:
         assert results[0][0] == "type_text_at"
         assert results[0][1] == {"status": "ok"}
 
-        # Should click, select all, delete, type
-        self.page.mouse.click.assert_called_once_with(720, 450)
-        assert self.page.keyboard.press.call_count == 2  # Meta+A and Backspace
-        self.page.keyboard.type.assert_called_once_with("Hello World")
+        # Single evaluate call replaces the click/select/type sequence
+        self.page.evaluate.assert_called_once_with(FAST_TYPE_SCRIPT, expected)
+        self.page.keyboard.type.assert_not_called()
 
-    def test_type_text_at_with_enter(self):
-        """Test type_text_at with press_enter=True."""
+    def test_type_text_at_keyboard_fallback(self):
+        """Test that non-editable targets fall back to the keyboard path."""
+        self.page.evaluate.side_effect = Exception("no editable element at point")
         candidate = self.create_candidate_with_call(
             "type_text_at",
-            {"x": 500, "y": 500, "text": "Search query", "press_enter": True},
+            {"x": 500, "y": 500, "text": "Hello World", "press_enter": True},
         )
 
         results = execute_function_calls(
@@ -123,39 +115,28 @@ class TestExecuteFunctionCalls:
         )
 
         assert results[0][1] == {"status": "ok"}
-        self.page.keyboard.type.assert_called_once_with("Search query")
-        # Should press Meta+A, Backspace, and Enter
+        # Should click, select all, delete, type, then press Enter
+        self.page.mouse.click.assert_called_once_with(720, 450)
         assert self.page.keyboard.press.call_count == 3
+        self.page.keyboard.type.assert_called_once_with("Hello World")
 
-    def test_type_text_at_without_enter(self):
-        """Test type_text_at with press_enter=False."""
-        candidate = self.create_candidate_with_call(
-            "type_text_at",
-            {"x": 500, "y": 500, "text": "Test", "press_enter": False},
-        )
-
-        results = execute_function_calls(
-            candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT
-        )
-
-        assert results[0][1] == {"status": "ok"}
-        # Should press Meta+A and Backspace only
-        assert self.page.keyboard.press.call_count == 2
-
-    def test_type_text_at_sanitizes_text(self):
-        """Test that type_text_at sanitizes input text."""
-        candidate = self.create_candidate_with_call(
-            "type_text_at",
-            {"x": 500, "y": 500, "text": "Hello\x00World\x01"},
-        )
+    def test_click_at_uses_cdp_session(self):
+        """Test that clicks go straight over the CDP session when provided."""
+        cdp = Mock()
+        candidate = self.create_candidate_with_call("click_at", {"x": 500, "y": 500})
 
         results = execute_function_calls(
-            candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT
+            candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT, cdp
         )
 
         assert results[0][1] == {"status": "ok"}
-        # Non-printable characters should be removed
-        self.page.keyboard.type.assert_called_once_with("HelloWorld")
+        # One pressed and one released event, no Playwright mouse involvement
+        assert cdp.send.call_count == 2
+        methods = [call.args[0] for call in cdp.send.call_args_list]
+        assert methods == ["Input.dispatchMouseEvent", "Input.dispatchMouseEvent"]
+        assert cdp.send.call_args_list[0].args[1]["type"] == "mousePressed"
+        assert cdp.send.call_args_list[1].args[1]["type"] == "mouseReleased"
+        self.page.mouse.click.assert_not_called()
 
     def test_unsupported_function(self):
         """Test handling of unsupported function."""
@@ -173,22 +154,17 @@ class TestExecuteFunctionCalls:
 
     def test_multiple_function_calls(self):
         """Test execution of multiple function calls."""
-        function_call1 = Mock(spec=FunctionCall)
-        function_call1.name = "click_at"
-        function_call1.args = {"x": 100, "y": 100}
-
-        function_call2 = Mock(spec=FunctionCall)
-        function_call2.name = "type_text_at"
-        function_call2.args = {"x": 200, "y": 200, "text": "test"}
-
-        part1 = Mock()
-        part1.function_call = function_call1
-        part2 = Mock()
-        part2.function_call = function_call2
-
-        candidate = Mock(spec=Candidate)
-        candidate.content = Mock()
-        candidate.content.parts = [part1, part2]
+        part1 = SimpleNamespace(
+            function_call=SimpleNamespace(name="click_at", args={"x": 100, "y": 100}),
+            text=None,
+        )
+        part2 = SimpleNamespace(
+            function_call=SimpleNamespace(
+                name="type_text_at", args={"x": 200, "y": 200, "text": "test"}
+            ),
+            text=None,
+        )
+        candidate = SimpleNamespace(content=SimpleNamespace(parts=[part1, part2]))
 
         results = execute_function_calls(
             candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT
@@ -212,19 +188,54 @@ class TestExecuteFunctionCalls:
         assert "error" in results[0][1]
         assert "Click failed" in results[0][1]["error"]
 
-    def test_wait_for_load_state_called(self):
-        """Test that wait_for_load_state is called after each action."""
+    def test_mutating_batch_invalidates_screenshot_cache(self):
+        """Test that page-touching actions drop the stale screenshot cache."""
+        computer_use_agent._screenshot_cache[("url", 1)] = b"stale"
         candidate = self.create_candidate_with_call("click_at", {"x": 500, "y": 500})
 
         execute_function_calls(candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT)
 
-        self.page.wait_for_load_state.assert_called_once()
+        assert computer_use_agent._screenshot_cache == {}
+
+    def test_noop_batch_keeps_screenshot_cache(self):
+        """Test that a no-op action leaves cached screenshots reusable."""
+        computer_use_agent._screenshot_cache[("url", 1)] = b"fresh"
+        candidate = self.create_candidate_with_call("open_web_browser", {})
 
-    @patch("computer_use_agent.time.sleep")
-    def test_page_settle_delay(self, mock_sleep):
-        """Test that page settle delay is applied."""
+        execute_function_calls(candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+        assert ("url", 1) in computer_use_agent._screenshot_cache
+        computer_use_agent._screenshot_cache.clear()
+
+    def test_wait_for_load_state_called(self):
+        """Test that the settle gates run after a page-touching batch."""
         candidate = self.create_candidate_with_call("click_at", {"x": 500, "y": 500})
 
         execute_function_calls(candidate, self.page, SCREEN_WIDTH, SCREEN_HEIGHT)
 
-        mock_sleep.assert_called_once_with(1.0)  # PAGE_SETTLE_DELAY_SECONDS
+        self.page.wait_for_load_state.assert_called_once_with(
+            timeout=LOAD_STATE_TIMEOUT_MS
+        )
+        # The aria-busy probe gates the screenshot that follows the batch
+        self.page.wait_for_function.assert_called_once()
+
+
+class TestWaitForDomStable:
+    """Tests for wait_for_dom_stable function."""
+
+    def test_probes_with_timeout(self):
+        """Test that the stability probe runs with the configured timeout."""
+        page = Mock()
+
+        wait_for_dom_stable(page)
+
+        page.wait_for_function.assert_called_once_with(
+            DOM_STABLE_SCRIPT, timeout=1500
+        )
+
+    def test_timeout_is_swallowed(self):
+        """Test that a slow page does not surface a settle error."""
+        page = Mock()
+        page.wait_for_function.side_effect = Exception("Timeout")
+
+        wait_for_dom_stable(page)  # Should not raise
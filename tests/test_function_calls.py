@@ -1,8 +1,146 @@
 """Unit tests for function call extraction and processing."""
-import pytest
-from unittest.mock import Mock, MagicMock
-from computer_use_agent import collect_function_calls, get_function_responses
-from google.genai.types import Candidate, Content, Part, FunctionCall, FunctionResponse
+import base64
+from types import SimpleNamespace
+
+from unittest.mock import Mock
+import computer_use_agent
+from computer_use_agent import (
+    cached_screenshot,
+    capture_screenshot,
+    collect_function_calls,
+    get_function_responses,
+)
+
+
+class TestCaptureScreenshot:
+    """Tests for capture_screenshot function."""
+
+    def test_cdp_fast_path(self):
+        """Test that a CDP session is preferred and its payload is decoded."""
+        page = Mock()
+        cdp = Mock()
+        cdp.send.return_value = {"data": base64.b64encode(b"jpeg_bytes").decode()}
+
+        result = capture_screenshot(page, cdp)
+
+        assert result == b"jpeg_bytes"
+        cdp.send.assert_called_once()
+        method, params = cdp.send.call_args[0]
+        assert method == "Page.captureScreenshot"
+        assert params["format"] == "jpeg"
+        assert params["optimizeForSpeed"] is True
+        assert params["fromSurface"] is False
+        assert params["captureBeyondViewport"] is False
+        page.bring_to_front.assert_called_once()
+        page.screenshot.assert_not_called()
+
+    def test_cdp_capture_downscales(self):
+        """Test that the CDP capture clips with a sub-1.0 scale factor."""
+        page = Mock()
+        cdp = Mock()
+        cdp.send.return_value = {"data": base64.b64encode(b"jpeg_bytes").decode()}
+
+        capture_screenshot(page, cdp)
+
+        params = cdp.send.call_args[0][1]
+        assert params["clip"]["width"] == 1440
+        assert params["clip"]["height"] == 900
+        assert 0 < params["clip"]["scale"] < 1.0
+
+    def test_retries_without_from_surface(self):
+        """Test that a rejected compositor capture retries with defaults."""
+        page = Mock()
+        cdp = Mock()
+        cdp.send.side_effect = [
+            Exception("fromSurface is not supported"),
+            {"data": base64.b64encode(b"jpeg_bytes").decode()},
+        ]
+
+        result = capture_screenshot(page, cdp)
+
+        assert result == b"jpeg_bytes"
+        assert cdp.send.call_count == 2
+        retry_params = cdp.send.call_args_list[1].args[1]
+        assert "fromSurface" not in retry_params
+        assert retry_params["format"] == "jpeg"
+        page.screenshot.assert_not_called()
+
+    def test_fallback_without_cdp(self):
+        """Test that Playwright's API is used when no CDP session exists."""
+        page = Mock()
+        page.screenshot.return_value = b"fake_screenshot"
+
+        result = capture_screenshot(page, None)
+
+        assert result == b"fake_screenshot"
+        page.screenshot.assert_called_once_with(type="jpeg", quality=70)
+
+    def test_fallback_on_cdp_error(self):
+        """Test that CDP failures fall back to Playwright's API."""
+        page = Mock()
+        page.screenshot.return_value = b"fake_screenshot"
+        cdp = Mock()
+        cdp.send.side_effect = Exception("CDP failed")
+
+        result = capture_screenshot(page, cdp)
+
+        assert result == b"fake_screenshot"
+
+
+class TestCachedScreenshot:
+    """Tests for cached_screenshot function."""
+
+    def setup_method(self):
+        """Start each test with an empty screenshot cache."""
+        computer_use_agent._screenshot_cache.clear()
+
+    def test_cache_hit_skips_capture(self):
+        """Test that an unchanged page reuses the encoded bytes."""
+        page = Mock()
+        page.url = "https://example.com"
+        page.evaluate.return_value = 1234
+        page.screenshot.return_value = b"fake_screenshot"
+
+        first = cached_screenshot(page)
+        second = cached_screenshot(page)
+
+        assert first == second == b"fake_screenshot"
+        page.screenshot.assert_called_once()
+
+    def test_dom_change_recaptures(self):
+        """Test that a changed DOM fingerprint forces a fresh capture."""
+        page = Mock()
+        page.url = "https://example.com"
+        page.evaluate.side_effect = [1234, 5678]
+        page.screenshot.side_effect = [b"first", b"second"]
+
+        assert cached_screenshot(page) == b"first"
+        assert cached_screenshot(page) == b"second"
+        assert page.screenshot.call_count == 2
+
+    def test_fingerprint_failure_bypasses_cache(self):
+        """Test that fingerprinting errors fall through to a plain capture."""
+        page = Mock()
+        page.url = "https://example.com"
+        page.evaluate.side_effect = Exception("evaluate failed")
+        page.screenshot.return_value = b"fake_screenshot"
+
+        assert cached_screenshot(page) == b"fake_screenshot"
+        assert computer_use_agent._screenshot_cache == {}
+
+    def test_cache_is_bounded(self):
+        """Test that old entries are evicted past the cache size."""
+        page = Mock()
+        page.url = "https://example.com"
+        page.screenshot.return_value = b"fake_screenshot"
+        for fingerprint in range(computer_use_agent.SCREENSHOT_CACHE_SIZE + 3):
+            page.evaluate.return_value = fingerprint
+            cached_screenshot(page)
+
+        assert (
+            len(computer_use_agent._screenshot_cache)
+            == computer_use_agent.SCREENSHOT_CACHE_SIZE
+        )
 
 
 class TestCollectFunctionCalls:
@@ -10,39 +148,27 @@ class TestCollectFunctionCalls:
 
     def test_no_content(self):
         """Test candidate with no content."""
-        candidate = Mock(spec=Candidate)
-        candidate.content = None
+        candidate = SimpleNamespace(content=None)
         result = collect_function_calls(candidate)
         assert result == []
 
     def test_no_parts(self):
         """Test candidate with content but no parts."""
-        candidate = Mock(spec=Candidate)
-        candidate.content = Mock()
-        candidate.content.parts = None
+        candidate = SimpleNamespace(content=SimpleNamespace(parts=None))
         result = collect_function_calls(candidate)
         assert result == []
 
     def test_empty_parts(self):
         """Test candidate with empty parts list."""
-        candidate = Mock(spec=Candidate)
-        candidate.content = Mock()
-        candidate.content.parts = []
+        candidate = SimpleNamespace(content=SimpleNamespace(parts=[]))
         result = collect_function_calls(candidate)
         assert result == []
 
     def test_single_function_call(self):
         """Test extraction of single function call."""
-        function_call = Mock(spec=FunctionCall)
-        function_call.name = "click_at"
-        function_call.args = {"x": 100, "y": 200}
-
-        part = Mock()
-        part.function_call = function_call
-
-        candidate = Mock(spec=Candidate)
-        candidate.content = Mock()
-        candidate.content.parts = [part]
+        function_call = SimpleNamespace(name="click_at", args={"x": 100, "y": 200})
+        part = SimpleNamespace(function_call=function_call, text=None)
+        candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]))
 
         result = collect_function_calls(candidate)
         assert len(result) == 1
@@ -50,23 +176,13 @@ class TestCollectFunctionCalls:
 
     def test_multiple_function_calls(self):
         """Test extraction of multiple function calls."""
-        function_call1 = Mock(spec=FunctionCall)
-        function_call1.name = "click_at"
-        function_call1.args = {"x": 100, "y": 200}
-
-        function_call2 = Mock(spec=FunctionCall)
-        function_call2.name = "type_text_at"
-        function_call2.args = {"x": 100, "y": 200, "text": "hello"}
-
-        part1 = Mock()
-        part1.function_call = function_call1
-
-        part2 = Mock()
-        part2.function_call = function_call2
-
-        candidate = Mock(spec=Candidate)
-        candidate.content = Mock()
-        candidate.content.parts = [part1, part2]
+        function_call1 = SimpleNamespace(name="click_at", args={"x": 100, "y": 200})
+        function_call2 = SimpleNamespace(
+            name="type_text_at", args={"x": 100, "y": 200, "text": "hello"}
+        )
+        part1 = SimpleNamespace(function_call=function_call1, text=None)
+        part2 = SimpleNamespace(function_call=function_call2, text=None)
+        candidate = SimpleNamespace(content=SimpleNamespace(parts=[part1, part2]))
 
         result = collect_function_calls(candidate)
         assert len(result) == 2
@@ -75,18 +191,12 @@ class TestCollectFunctionCalls:
 
     def test_mixed_parts(self):
         """Test extraction with mixed parts (text and function calls)."""
-        function_call = Mock(spec=FunctionCall)
-        function_call.name = "click_at"
-
-        part_with_call = Mock()
-        part_with_call.function_call = function_call
-
-        part_without_call = Mock()
-        part_without_call.function_call = None
-
-        candidate = Mock(spec=Candidate)
-        candidate.content = Mock()
-        candidate.content.parts = [part_without_call, part_with_call]
+        function_call = SimpleNamespace(name="click_at", args={})
+        part_with_call = SimpleNamespace(function_call=function_call, text=None)
+        part_without_call = SimpleNamespace(function_call=None, text="thinking...")
+        candidate = SimpleNamespace(
+            content=SimpleNamespace(parts=[part_without_call, part_with_call])
+        )
 
         result = collect_function_calls(candidate)
         assert len(result) == 1
@@ -96,53 +206,41 @@ class TestCollectFunctionCalls:
 class TestGetFunctionResponses:
     """Tests for get_function_responses function."""
 
-    def test_empty_results(self):
+    def test_empty_results(self, ok_page):
         """Test with empty results list."""
-        page = Mock()
-        page.screenshot.return_value = b"fake_screenshot"
-        page.url = "https://example.com"
-
-        result = get_function_responses(page, [])
+        result = get_function_responses(ok_page, [])
         assert result == []
 
-    def test_single_result(self):
+    def test_single_result(self, ok_page, ok_results):
         """Test with single function result."""
-        page = Mock()
-        page.screenshot.return_value = b"fake_screenshot"
-        page.url = "https://example.com"
+        from google.genai.types import FunctionResponse
 
-        results = [("click_at", {"status": "ok"})]
-        responses = get_function_responses(page, results)
+        responses = get_function_responses(ok_page, ok_results)
 
         assert len(responses) == 1
         assert isinstance(responses[0], FunctionResponse)
         assert responses[0].name == "click_at"
         assert responses[0].response == {"url": "https://example.com", "status": "ok"}
 
-    def test_multiple_results(self):
+    def test_multiple_results(self, ok_page):
         """Test with multiple function results."""
-        page = Mock()
-        page.screenshot.return_value = b"fake_screenshot"
-        page.url = "https://example.com"
-
         results = [
             ("click_at", {"status": "ok"}),
             ("type_text_at", {"status": "ok"}),
         ]
-        responses = get_function_responses(page, results)
+        responses = get_function_responses(ok_page, results)
 
         assert len(responses) == 2
         assert responses[0].name == "click_at"
         assert responses[1].name == "type_text_at"
+        # Only the first response carries the screenshot blob
+        assert len(responses[0].parts) == 1
+        assert responses[1].parts == []
 
-    def test_error_result(self):
+    def test_error_result(self, ok_page):
         """Test with error result."""
-        page = Mock()
-        page.screenshot.return_value = b"fake_screenshot"
-        page.url = "https://example.com"
-
         results = [("click_at", {"error": "Element not found"})]
-        responses = get_function_responses(page, results)
+        responses = get_function_responses(ok_page, results)
 
         assert len(responses) == 1
         assert responses[0].response == {
@@ -150,40 +248,28 @@ class TestGetFunctionResponses:
             "error": "Element not found",
         }
 
-    def test_screenshot_failure(self):
+    def test_screenshot_failure(self, ok_page, ok_results):
         """Test handling of screenshot failure."""
-        page = Mock()
-        page.screenshot.side_effect = Exception("Screenshot failed")
-        page.url = "https://example.com"
+        ok_page.screenshot.side_effect = Exception("Screenshot failed")
 
-        results = [("click_at", {"status": "ok"})]
-        responses = get_function_responses(page, results)
+        responses = get_function_responses(ok_page, ok_results)
 
         # Should still return response but with empty screenshot
         assert len(responses) == 1
         assert responses[0].name == "click_at"
 
-    def test_url_included_in_response(self):
+    def test_url_included_in_response(self, ok_page, ok_results):
         """Test that current URL is included in response."""
-        page = Mock()
-        page.screenshot.return_value = b"fake_screenshot"
-        page.url = "https://example.com/page"
+        ok_page.url = "https://example.com/page"
 
-        results = [("click_at", {"status": "ok"})]
-        responses = get_function_responses(page, results)
+        responses = get_function_responses(ok_page, ok_results)
 
         assert responses[0].response["url"] == "https://example.com/page"
 
-    def test_screenshot_included_in_parts(self):
+    def test_screenshot_included_in_parts(self, ok_page, ok_results):
         """Test that screenshot is included in response parts."""
-        page = Mock()
-        screenshot_data = b"fake_screenshot_data"
-        page.screenshot.return_value = screenshot_data
-        page.url = "https://example.com"
-
-        results = [("click_at", {"status": "ok"})]
-        responses = get_function_responses(page, results)
+        responses = get_function_responses(ok_page, ok_results)
 
         assert len(responses[0].parts) == 1
-        assert responses[0].parts[0].inline_data.mime_type == "image/png"
-        assert responses[0].parts[0].inline_data.data == screenshot_data
+        assert responses[0].parts[0].inline_data.mime_type == "image/jpeg"
+        assert responses[0].parts[0].inline_data.data == b"fake_screenshot"
@@ -1,297 +1,179 @@
 """Integration tests for the computer use agent."""
+from types import SimpleNamespace
+
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from computer_use_agent import run_agent, SCREEN_WIDTH, SCREEN_HEIGHT
+from unittest.mock import Mock, patch
+from computer_use_agent import (
+    BrowserPool,
+    run_agent,
+    SCREEN_WIDTH,
+    SCREEN_HEIGHT,
+)
+
+
+def _response(*parts):
+    """Build a read-only generate_content response around the given parts."""
+    return SimpleNamespace(
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=list(parts)))]
+    )
+
+
+# Canned model replies shared across tests; never mutated, so module scope
+# avoids rebuilding the Mock tree per test (and per turn in the loop tests).
+RESPONSE_CLICK = _response(
+    SimpleNamespace(
+        function_call=SimpleNamespace(name="click_at", args={"x": 500, "y": 500}),
+        text=None,
+    )
+)
+RESPONSE_DONE = _response(SimpleNamespace(function_call=None, text="Task completed"))
 
 
 @pytest.mark.integration
-class TestRunAgent:
-    """Integration tests for run_agent function."""
+class TestBrowserPool:
+    """Tests for BrowserPool context reuse."""
 
     @patch("computer_use_agent.sync_playwright")
-    @patch("computer_use_agent.create_client")
-    @patch("computer_use_agent.configure_logging")
-    def test_run_agent_basic_flow(
-        self, mock_configure_logging, mock_create_client, mock_playwright
-    ):
-        """Test basic agent flow with mocked dependencies."""
-        # Setup mocks
-        mock_client = Mock()
-        mock_create_client.return_value = mock_client
+    def test_browser_launched_once(self, mock_playwright):
+        """Test that repeated acquires share one browser launch."""
+        mock_browser = Mock()
+        playwright_instance = Mock()
+        playwright_instance.chromium.launch.return_value = mock_browser
+        mock_playwright.return_value.start.return_value = playwright_instance
 
-        # Mock browser and page
+        pool = BrowserPool(headless=True)
+        pool.acquire()
+        pool.acquire()
+
+        playwright_instance.chromium.launch.assert_called_once_with(headless=True)
+        assert mock_browser.new_context.call_count == 2
+
+    @patch("computer_use_agent.sync_playwright")
+    def test_released_context_is_reused(self, mock_playwright):
+        """Test that a released context is cleared and handed back out."""
         mock_browser = Mock()
-        mock_context = Mock()
-        mock_page = Mock()
-        mock_page.url = "https://example.com"
-        mock_page.screenshot.return_value = b"fake_screenshot"
+        playwright_instance = Mock()
+        playwright_instance.chromium.launch.return_value = mock_browser
+        mock_playwright.return_value.start.return_value = playwright_instance
 
-        # Setup context manager chain
-        mock_context.new_page.return_value = mock_page
-        mock_context.__enter__ = Mock(return_value=mock_context)
-        mock_context.__exit__ = Mock(return_value=False)
+        pool = BrowserPool(headless=True)
+        context = pool.acquire()
+        pool.release(context)
 
-        mock_browser.new_context.return_value = mock_context
-        mock_browser.close = Mock()
+        context.clear_cookies.assert_called_once()
+        assert pool.acquire() is context
+        mock_browser.new_context.assert_called_once()
 
+    @patch("computer_use_agent.sync_playwright")
+    def test_close_shuts_everything_down(self, mock_playwright):
+        """Test that close tears down contexts, browser, and Playwright."""
+        mock_browser = Mock()
         playwright_instance = Mock()
         playwright_instance.chromium.launch.return_value = mock_browser
-        playwright_instance.__enter__ = Mock(return_value=playwright_instance)
-        playwright_instance.__exit__ = Mock(return_value=False)
+        mock_playwright.return_value.start.return_value = playwright_instance
+
+        pool = BrowserPool(headless=True)
+        context = pool.acquire()
+        pool.release(context)
+        pool.close()
+
+        context.close.assert_called_once()
+        mock_browser.close.assert_called_once()
+        playwright_instance.stop.assert_called_once()
 
-        mock_playwright.return_value = playwright_instance
 
-        # Mock model response (text response, no function calls)
-        mock_candidate = Mock()
-        mock_candidate.content = Mock()
-        mock_candidate.content.parts = [Mock(text="Task completed", function_call=None)]
+@pytest.mark.integration
+class TestRunAgent:
+    """Integration tests for run_agent function."""
 
-        mock_response = Mock()
-        mock_response.candidates = [mock_candidate]
-        mock_client.models.generate_content.return_value = mock_response
+    def test_run_agent_basic_flow(self, agent_mocks):
+        """Test basic agent flow with mocked dependencies."""
+        # Model replies with text only, no function calls
+        agent_mocks.client.models.generate_content.return_value = RESPONSE_DONE
 
         # Run agent
         run_agent("Test prompt", headless=True)
 
         # Verify logging was configured
-        mock_configure_logging.assert_called_once()
+        agent_mocks.configure_logging.assert_called_once()
 
         # Verify client was created
-        mock_create_client.assert_called_once()
+        agent_mocks.create_client.assert_called_once()
 
         # Verify browser was launched
-        playwright_instance.chromium.launch.assert_called_once_with(headless=True)
+        agent_mocks.stack.playwright.chromium.launch.assert_called_once_with(
+            headless=True
+        )
 
         # Verify browser context was created with correct viewport
-        mock_browser.new_context.assert_called_once_with(
+        agent_mocks.stack.browser.new_context.assert_called_once_with(
             viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT}
         )
 
         # Verify page navigation
-        mock_page.goto.assert_called_once()
+        agent_mocks.stack.page.goto.assert_called_once()
 
         # Verify browser was closed
-        mock_browser.close.assert_called_once()
+        agent_mocks.stack.browser.close.assert_called_once()
 
-    @patch("computer_use_agent.sync_playwright")
-    @patch("computer_use_agent.create_client")
-    @patch("computer_use_agent.configure_logging")
-    def test_run_agent_with_function_calls(
-        self, mock_configure_logging, mock_create_client, mock_playwright
-    ):
+    def test_run_agent_with_function_calls(self, agent_mocks):
         """Test agent flow with function calls."""
-        # Setup mocks
-        mock_client = Mock()
-        mock_create_client.return_value = mock_client
-
-        # Mock browser and page
-        mock_browser = Mock()
-        mock_context = Mock()
-        mock_page = Mock()
-        mock_page.url = "https://example.com"
-        mock_page.screenshot.return_value = b"fake_screenshot"
-        mock_page.mouse = Mock()
-        mock_page.wait_for_load_state = Mock()
-
-        # Setup context manager chain
-        mock_context.new_page.return_value = mock_page
-        mock_context.__enter__ = Mock(return_value=mock_context)
-        mock_context.__exit__ = Mock(return_value=False)
-
-        mock_browser.new_context.return_value = mock_context
-
-        playwright_instance = Mock()
-        playwright_instance.chromium.launch.return_value = mock_browser
-        playwright_instance.__enter__ = Mock(return_value=playwright_instance)
-        playwright_instance.__exit__ = Mock(return_value=False)
-
-        mock_playwright.return_value = playwright_instance
-
-        # Mock model responses
-        # First response: function call
-        function_call = Mock()
-        function_call.name = "click_at"
-        function_call.args = {"x": 500, "y": 500}
-
-        first_part = Mock()
-        first_part.function_call = function_call
-
-        first_candidate = Mock()
-        first_candidate.content = Mock()
-        first_candidate.content.parts = [first_part]
-
-        first_response = Mock()
-        first_response.candidates = [first_candidate]
-
-        # Second response: text completion
-        second_part = Mock()
-        second_part.text = "Done"
-        second_part.function_call = None
-
-        second_candidate = Mock()
-        second_candidate.content = Mock()
-        second_candidate.content.parts = [second_part]
-
-        second_response = Mock()
-        second_response.candidates = [second_candidate]
-
-        # Setup generate_content to return different responses
-        mock_client.models.generate_content.side_effect = [
-            first_response,
-            second_response,
+        # First reply asks for a click, second reply completes with text
+        agent_mocks.client.models.generate_content.side_effect = [
+            RESPONSE_CLICK,
+            RESPONSE_DONE,
         ]
 
         # Run agent
-        with patch("computer_use_agent.time.sleep"):
-            run_agent("Test prompt with actions", headless=True)
-
-        # Verify function was executed
-        mock_page.mouse.click.assert_called_once()
+        run_agent("Test prompt with actions", headless=True)
+
+        # Verify function was executed over the CDP session
+        mock_cdp = agent_mocks.stack.context.new_cdp_session.return_value
+        click_events = [
+            call
+            for call in mock_cdp.send.call_args_list
+            if call.args[0] == "Input.dispatchMouseEvent"
+        ]
+        assert len(click_events) == 2  # pressed + released
 
         # Verify model was called twice
-        assert mock_client.models.generate_content.call_count == 2
+        assert agent_mocks.client.models.generate_content.call_count == 2
 
-    @patch("computer_use_agent.sync_playwright")
-    @patch("computer_use_agent.create_client")
-    @patch("computer_use_agent.configure_logging")
-    def test_run_agent_max_turns(
-        self, mock_configure_logging, mock_create_client, mock_playwright
-    ):
+    def test_run_agent_max_turns(self, agent_mocks, monkeypatch):
         """Test that agent stops after maximum turns."""
-        # Setup mocks
-        mock_client = Mock()
-        mock_create_client.return_value = mock_client
-
-        # Mock browser and page
-        mock_browser = Mock()
-        mock_context = Mock()
-        mock_page = Mock()
-        mock_page.url = "https://example.com"
-        mock_page.screenshot.return_value = b"fake_screenshot"
-        mock_page.mouse = Mock()
-        mock_page.wait_for_load_state = Mock()
-
-        # Setup context manager chain
-        mock_context.new_page.return_value = mock_page
-        mock_context.__enter__ = Mock(return_value=mock_context)
-        mock_context.__exit__ = Mock(return_value=False)
-
-        mock_browser.new_context.return_value = mock_context
-
-        playwright_instance = Mock()
-        playwright_instance.chromium.launch.return_value = mock_browser
-        playwright_instance.__enter__ = Mock(return_value=playwright_instance)
-        playwright_instance.__exit__ = Mock(return_value=False)
-
-        mock_playwright.return_value = playwright_instance
-
-        # Mock model to always return function calls (never complete)
-        function_call = Mock()
-        function_call.name = "click_at"
-        function_call.args = {"x": 500, "y": 500}
-
-        part = Mock()
-        part.function_call = function_call
-
-        candidate = Mock()
-        candidate.content = Mock()
-        candidate.content.parts = [part]
-
-        response = Mock()
-        response.candidates = [candidate]
+        # A smaller turn budget exercises the same loop bound faster
+        monkeypatch.setattr("computer_use_agent.MAX_TURNS", 2)
 
-        mock_client.models.generate_content.return_value = response
+        # Model always returns function calls (never completes)
+        agent_mocks.client.models.generate_content.return_value = RESPONSE_CLICK
 
         # Run agent
-        with patch("computer_use_agent.time.sleep"):
-            run_agent("Test prompt", headless=True)
-
-        # Verify model was called MAX_TURNS times (5)
-        from computer_use_agent import MAX_TURNS
+        run_agent("Test prompt", headless=True)
 
-        assert mock_client.models.generate_content.call_count == MAX_TURNS
+        # Verify model was called exactly the patched MAX_TURNS times
+        assert agent_mocks.client.models.generate_content.call_count == 2
 
-    @patch("computer_use_agent.sync_playwright")
-    @patch("computer_use_agent.create_client")
-    @patch("computer_use_agent.configure_logging")
-    def test_run_agent_handles_api_error(
-        self, mock_configure_logging, mock_create_client, mock_playwright
-    ):
+    def test_run_agent_handles_api_error(self, agent_mocks):
         """Test that agent handles API errors gracefully."""
-        # Setup mocks
-        mock_client = Mock()
-        mock_create_client.return_value = mock_client
-
-        # Mock browser and page
-        mock_browser = Mock()
-        mock_context = Mock()
-        mock_page = Mock()
-        mock_page.screenshot.return_value = b"fake_screenshot"
-
-        mock_context.new_page.return_value = mock_page
-        mock_context.__enter__ = Mock(return_value=mock_context)
-        mock_context.__exit__ = Mock(return_value=False)
-
-        mock_browser.new_context.return_value = mock_context
-
-        playwright_instance = Mock()
-        playwright_instance.chromium.launch.return_value = mock_browser
-        playwright_instance.__enter__ = Mock(return_value=playwright_instance)
-        playwright_instance.__exit__ = Mock(return_value=False)
-
-        mock_playwright.return_value = playwright_instance
-
         # Mock API to raise error
-        mock_client.models.generate_content.side_effect = Exception("API Error")
+        agent_mocks.client.models.generate_content.side_effect = Exception(
+            "API Error"
+        )
 
         # Should not raise exception
         run_agent("Test prompt", headless=True)
 
         # Verify browser was still closed
-        mock_browser.close.assert_called_once()
+        agent_mocks.stack.browser.close.assert_called_once()
 
-    @patch("computer_use_agent.sync_playwright")
-    @patch("computer_use_agent.create_client")
-    @patch("computer_use_agent.configure_logging")
-    def test_run_agent_headless_parameter(
-        self, mock_configure_logging, mock_create_client, mock_playwright
-    ):
+    @pytest.mark.parametrize("headless", [True, False])
+    def test_run_agent_headless_parameter(self, agent_mocks, headless):
         """Test that headless parameter is passed correctly."""
-        # Setup minimal mocks
-        mock_client = Mock()
-        mock_create_client.return_value = mock_client
+        # Model replies with text only, no function calls
+        agent_mocks.client.models.generate_content.return_value = RESPONSE_DONE
 
-        mock_browser = Mock()
-        mock_context = Mock()
-        mock_page = Mock()
-        mock_page.screenshot.return_value = b"fake_screenshot"
+        run_agent("Test", headless=headless)
 
-        mock_context.new_page.return_value = mock_page
-        mock_context.__enter__ = Mock(return_value=mock_context)
-        mock_context.__exit__ = Mock(return_value=False)
-
-        mock_browser.new_context.return_value = mock_context
-
-        playwright_instance = Mock()
-        playwright_instance.chromium.launch.return_value = mock_browser
-        playwright_instance.__enter__ = Mock(return_value=playwright_instance)
-        playwright_instance.__exit__ = Mock(return_value=False)
-
-        mock_playwright.return_value = playwright_instance
-
-        # Mock simple text response
-        mock_candidate = Mock()
-        mock_candidate.content = Mock()
-        mock_candidate.content.parts = [Mock(text="Done", function_call=None)]
-
-        mock_response = Mock()
-        mock_response.candidates = [mock_candidate]
-        mock_client.models.generate_content.return_value = mock_response
-
-        # Test with headless=True
-        run_agent("Test", headless=True)
-        playwright_instance.chromium.launch.assert_called_with(headless=True)
-
-        # Test with headless=False
-        run_agent("Test", headless=False)
-        playwright_instance.chromium.launch.assert_called_with(headless=False)
+        agent_mocks.stack.playwright.chromium.launch.assert_called_once_with(
+            headless=headless
+        )
@@ -4,48 +4,45 @@ from computer_use_agent import (
     denormalize_coordinate,
     sanitize_text,
     extract_text_response,
+    trim_contents,
+    CONTEXT_WINDOW_TURNS,
 )
-from google.genai.types import Part
+# A part carrying no text attribute at all; plain object() is enough and
+# avoids creating a throwaway class inside the test body.
+_NO_TEXT_PART = object()
 
 
 class TestDenormalizeCoordinate:
     """Tests for denormalize_coordinate function."""
 
-    def test_zero_coordinate(self):
-        """Test that 0 normalizes to 0."""
-        result = denormalize_coordinate(0, 1440)
-        assert result == 0
-
-    def test_max_coordinate(self):
-        """Test that 1000 normalizes to screen dimension."""
-        result = denormalize_coordinate(1000, 1440)
-        assert result == 1440
-
-    def test_middle_coordinate(self):
-        """Test that 500 normalizes to half of screen dimension."""
-        result = denormalize_coordinate(500, 1440)
-        assert result == 720
-
-    def test_clamping_above_max(self):
-        """Test that values above 1000 are clamped to max."""
-        result = denormalize_coordinate(1500, 1440)
-        assert result == 1440
-
-    def test_clamping_below_min(self):
-        """Test that negative values are clamped to 0."""
-        result = denormalize_coordinate(-100, 1440)
-        assert result == 0
-
-    def test_float_values(self):
-        """Test that float values are handled correctly."""
-        result = denormalize_coordinate(250.5, 1440)
-        assert result == 360  # 250.5/1000 * 1440 = 360.72
-
-    def test_different_dimensions(self):
-        """Test with different screen dimensions."""
-        assert denormalize_coordinate(500, 900) == 450
-        assert denormalize_coordinate(500, 1920) == 960
-        assert denormalize_coordinate(500, 1080) == 540
+    @pytest.mark.parametrize(
+        "value,dimension,expected",
+        [
+            (0, 1440, 0),
+            (1000, 1440, 1440),
+            (500, 1440, 720),
+            (1500, 1440, 1440),  # clamped above max
+            (-100, 1440, 0),  # clamped below min
+            (250.5, 1440, 360),  # 250.5/1000 * 1440 = 360.72
+            (500, 900, 450),
+            (500, 1920, 960),
+            (500, 1080, 540),
+        ],
+        ids=[
+            "zero",
+            "max",
+            "middle",
+            "clamp-high",
+            "clamp-low",
+            "float",
+            "dim-900",
+            "dim-1920",
+            "dim-1080",
+        ],
+    )
+    def test_denormalize(self, value, dimension, expected):
+        """Test conversion, clamping, and float handling across dimensions."""
+        assert denormalize_coordinate(value, dimension) == expected
 
 
 class TestSanitizeText:
@@ -93,54 +90,68 @@ class TestSanitizeText:
         assert result == "ValidInvalidText"
 
 
+@pytest.fixture(scope="module")
+def extract_cases():
+    """Named (parts, expected) extraction cases; Part construction is paid once."""
+    from google.genai.types import Part
+
+    return {
+        "single": ([Part(text="Hello World")], "Hello World"),
+        "multiple": ([Part(text="Hello"), Part(text="World")], "Hello World"),
+        "empty": ([], ""),
+        "whitespace": (
+            [Part(text="  Hello  "), Part(text="  World  ")],
+            "Hello World",
+        ),
+        "empty-text": (
+            [Part(text="Hello"), Part(text=""), Part(text="World")],
+            "Hello World",
+        ),
+    }
+
+
 class TestExtractTextResponse:
     """Tests for extract_text_response function."""
 
-    def test_single_text_part(self):
-        """Test extraction from single text part."""
-        parts = [Part(text="Hello World")]
-        result = extract_text_response(parts)
-        assert result == "Hello World"
+    @pytest.mark.parametrize(
+        "case", ["single", "multiple", "empty", "whitespace", "empty-text"]
+    )
+    def test_extract_text(self, extract_cases, case):
+        """Test extraction across single/multiple/empty/whitespace part lists."""
+        parts, expected = extract_cases[case]
+        assert extract_text_response(parts) == expected
 
-    def test_multiple_text_parts(self):
-        """Test extraction from multiple text parts."""
-        parts = [
-            Part(text="Hello"),
-            Part(text="World"),
-        ]
-        result = extract_text_response(parts)
-        assert result == "Hello World"
+    def test_parts_without_text_attribute(self):
+        """Test handling of parts without text attribute."""
+        assert extract_text_response([_NO_TEXT_PART]) == ""
 
-    def test_empty_parts(self):
-        """Test with empty parts list."""
-        result = extract_text_response([])
-        assert result == ""
 
-    def test_parts_with_whitespace(self):
-        """Test that whitespace is stripped from parts."""
-        parts = [
-            Part(text="  Hello  "),
-            Part(text="  World  "),
-        ]
-        result = extract_text_response(parts)
-        assert result == "Hello World"
+class TestTrimContents:
+    """Tests for trim_contents function."""
 
-    def test_parts_with_empty_text(self):
-        """Test that empty text parts are ignored."""
-        parts = [
-            Part(text="Hello"),
-            Part(text=""),
-            Part(text="World"),
-        ]
-        result = extract_text_response(parts)
-        assert result == "Hello World"
+    def test_short_conversation_unchanged(self):
+        """Test that conversations within the window pass through untouched."""
+        contents = ["prompt", "model-1", "user-1"]
+        assert trim_contents(contents) == contents
 
-    def test_parts_without_text_attribute(self):
-        """Test handling of parts without text attribute."""
-        # Create a mock part without text attribute
-        class MockPart:
-            pass
+    def test_long_conversation_is_windowed(self):
+        """Test that old exchanges are dropped past the window."""
+        contents = ["prompt"]
+        for turn in range(1, 6):
+            contents += [f"model-{turn}", f"user-{turn}"]
 
-        parts = [MockPart()]
-        result = extract_text_response(parts)
-        assert result == ""
+        trimmed = trim_contents(contents)
+
+        assert trimmed[0] == "prompt"
+        assert len(trimmed) == 1 + 2 * CONTEXT_WINDOW_TURNS
+        assert trimmed[-1] == "user-5"
+
+    def test_window_starts_on_model_content(self):
+        """Test that the kept tail is aligned to (model, user) pairs."""
+        contents = ["prompt"]
+        for turn in range(1, 6):
+            contents += [f"model-{turn}", f"user-{turn}"]
+
+        trimmed = trim_contents(contents)
+
+        assert trimmed[1].startswith("model-")